@@ -2,6 +2,8 @@
 # Sources: CIQUAL (ANSES), USDA
 # Format: "aliment": (kcal, proteines, lipides, glucides)
 
+import functools
+
 FOODS_DATABASE = {
     # ==================== VIANDES ====================
     "poulet": (121, 26, 1.8, 0),
@@ -564,10 +566,31 @@ STANDARD_UNITS = {
     "brioche": 40,
 }
 
+# Index des unités standards, construit une seule fois à l'import
+# Structure: {mot: [unités contenant ce mot, dans l'ordre de STANDARD_UNITS]}
+STD_UNIT_KEYS = tuple(STANDARD_UNITS.keys())
+_STD_TOKEN_INDEX = {}
+for _std_name in STD_UNIT_KEYS:
+    for _token in set(_std_name.split()):
+        _STD_TOKEN_INDEX.setdefault(_token, []).append(_std_name)
+_STD_ORDER = {name: i for i, name in enumerate(STD_UNIT_KEYS)}
+
+# Index trigrammes pour /search
+# Structure: {trigramme: {aliments contenant ce trigramme}}
+TRIGRAM_INDEX = {}
+_FOOD_ORDER = {}
+_SHORT_FOODS = set()  # Noms de moins de 3 caractères, sans trigramme
+_EMPTY = frozenset()
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+@functools.lru_cache(maxsize=1024)
 def get_food_info(food_name: str) -> tuple:
     """
     Retourne les infos nutritionnelles pour 100g d'un aliment.
     Returns: (kcal, proteines, lipides, glucides) ou None si non trouvé
+    (résultat en cache: appeler get_food_info.cache_clear() après modification de FOODS_DATABASE)
     """
     food_lower = food_name.lower().strip()
 
@@ -587,16 +610,61 @@ def get_food_info(food_name: str) -> tuple:
 
     return None
 
+def get_standard_unit(food_name: str) -> float:
+    """
+    Retourne le poids en grammes d'une unité standard ("oeuf", "banane"...).
+    Returns: grammes par unité ou None si non trouvé
+    """
+    # Recherche exacte
+    if food_name in STANDARD_UNITS:
+        return STANDARD_UNITS[food_name]
+
+    # Candidats via les mots du nom, puis vérification par sous-chaîne
+    candidates = set()
+    for token in food_name.split():
+        candidates.update(_STD_TOKEN_INDEX.get(token, ()))
+    for std_name in sorted(candidates, key=_STD_ORDER.__getitem__):
+        if std_name in food_name or food_name in std_name:
+            return STANDARD_UNITS[std_name]
+
+    # Repli: sous-chaînes ne tombant pas sur un mot entier ("oeufs" -> "oeuf")
+    for std_name in STD_UNIT_KEYS:
+        if std_name in food_name or food_name in std_name:
+            return STANDARD_UNITS[std_name]
+
+    return None
+
+def index_food(food_name: str):
+    """Ajoute un aliment à l'index de recherche (à appeler après l'avoir ajouté à la base)"""
+    _FOOD_ORDER.setdefault(food_name, len(_FOOD_ORDER))
+    if len(food_name) < 3:
+        _SHORT_FOODS.add(food_name)
+    for trigram in _trigrams(food_name):
+        TRIGRAM_INDEX.setdefault(trigram, set()).add(food_name)
+
 def search_foods(query: str) -> list:
     """
     Recherche des aliments correspondant à la requête.
     Returns: liste de noms d'aliments correspondants
     """
     query_lower = query.lower().strip()
-    results = []
 
-    for food_name in FOODS_DATABASE.keys():
-        if query_lower in food_name or food_name in query_lower:
-            results.append(food_name)
+    if len(query_lower) < 3:
+        candidates = FOODS_DATABASE.keys()
+    else:
+        # Tout aliment qui contient la requête (ou y est contenu) partage
+        # au moins un trigramme avec elle
+        postings = [TRIGRAM_INDEX.get(trigram, _EMPTY) for trigram in _trigrams(query_lower)]
+        candidates = set().union(*postings) | _SHORT_FOODS
+
+    results = [
+        food_name for food_name in candidates
+        if query_lower in food_name or food_name in query_lower
+    ]
+    # Les correspondances en début de nom d'abord, puis l'ordre de la base
+    results.sort(key=lambda name: (max(name.find(query_lower), 0), _FOOD_ORDER[name]))
 
     return results[:10]
+
+for _food_name in FOODS_DATABASE:
+    index_food(_food_name)
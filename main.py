@@ -1,14 +1,22 @@
 import os
 import re
+import html
 import json
+import time
+import asyncio
 import logging
+import sqlite3
+import functools
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from telegram.constants import ParseMode
+from telegram.ext import AIORateLimiter, Application, CommandHandler, Defaults, MessageHandler, filters, ContextTypes
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-from foods_database import FOODS_DATABASE, STANDARD_UNITS, get_food_info, search_foods
+from foods_database import FOODS_DATABASE, get_food_info, get_standard_unit, index_food, search_foods
 
 # Configuration du logging
 logging.basicConfig(
@@ -19,8 +27,11 @@ logger = logging.getLogger(__name__)
 
 # Configuration
 TELEGRAM_TOKEN = os.environ.get("TELEGRAM_TOKEN")
-CHAT_ID = os.environ.get("CHAT_ID")  # Ton chat ID pour les rappels
+CHAT_ID = os.environ.get("CHAT_ID")  # Ton chat ID pour les rappels (plusieurs: séparés par des virgules)
+REMINDER_CHAT_IDS = [chat_id.strip() for chat_id in (CHAT_ID or "").split(",") if chat_id.strip()]
+REMINDER_WAVE_SIZE = 25  # Rappels envoyés par seconde (limite Telegram ~30 msg/s)
 TIMEZONE = ZoneInfo("Europe/Paris")
+DB_PATH = os.environ.get("DB_PATH", "nutrition.db")  # Sauvegarde SQLite des entrées
 
 # Objectifs journaliers
 DAILY_GOALS = {
@@ -30,24 +41,86 @@ DAILY_GOALS = {
     "glucides": 400
 }
 
-# Stockage des données (en mémoire, reset au redémarrage du serveur)
-# Structure: {date_str: {"entries": [...], "totals": {...}}}
-daily_data = {}
+# Bornes mémoire: au-delà, les jours et entrées les plus anciens sont oubliés
+MAX_DAYS = 7
+MAX_ENTRIES_PER_DAY = 200
+
+# Stockage des données (en mémoire, sauvegardé dans DB_PATH et rechargé au démarrage)
+# Structure: {date_str: {"entries": deque([...]), "totals": {...}, "_prot_pct": float, "_status_emoji": str}}
+daily_data = OrderedDict()
 last_entry = None  # Pour le /undo
+_TODAY_CACHE = [0, ""]  # [minute depuis epoch, clé YYYY-MM-DD]
+_HM_CACHE = [0, ""]  # [minute depuis epoch, heure HH:MM]
+
+# Conversion des unités en grammes (liquides: 1ml ≈ 1g)
+UNIT_TO_GRAMS = {
+    "kg": 1000,
+    "l": 1000,
+    "cl": 10,
+    "ml": 1,
+    "g": 1,
+    "gr": 1,
+    "gramme": 1,
+    "grammes": 1
+}
+
+# Barres de progression précalculées: BARS[n] = n points pleins
+BAR_LENGTH = 8
+BARS = tuple("●" * i + "○" * (BAR_LENGTH - i) for i in range(BAR_LENGTH + 1))
+
+# Lignes du statut: (emoji, libellé, clé, unité)
+STATUS_ROWS = (
+    ("🔥", "Kcal", "kcal", ""),
+    ("🥩", "Prot", "proteines", "g"),
+    ("🧈", "Lip", "lipides", "g"),
+    ("🍚", "Gluc", "glucides", "g"),
+)
+
+# Regex précompilées (appelées à chaque message)
+# "200g pates", "3 oeufs", "1 verre lait"
+PAT_FOOD = re.compile(r'^(\d+(?:[.,]\d+)?)\s*(g|gr|grammes?|ml|cl|l|kg)?\s*(?:de\s+|d\')?(.+)$')
+# "pates 200g"
+PAT_FOOD_INV = re.compile(r'^(.+?)\s+(\d+(?:[.,]\d+)?)\s*(g|gr|grammes?|ml|cl|l|kg)?$')
+# "/add 30g 150kcal 10p 5l 8g"
+PAT_ADD_FULL = re.compile(r'(\d+(?:[.,]\d+)?)\s*(g|gr|grammes?)\s+(\d+(?:[.,]\d+)?)\s*kcal\s+(\d+(?:[.,]\d+)?)\s*p\s+(\d+(?:[.,]\d+)?)\s*l\s+(\d+(?:[.,]\d+)?)\s*g')
+# "/add 150kcal 10p 5l 8g"
+PAT_ADD_NOQTY = re.compile(r'(\d+(?:[.,]\d+)?)\s*kcal\s+(\d+(?:[.,]\d+)?)\s*p\s+(\d+(?:[.,]\d+)?)\s*l\s+(\d+(?:[.,]\d+)?)\s*g')
 
 # ==================== FONCTIONS UTILITAIRES ====================
 
 def get_today_key() -> str:
-    """Retourne la clé pour aujourd'hui au format YYYY-MM-DD"""
-    return datetime.now(TIMEZONE).strftime("%Y-%m-%d")
+    """Retourne la clé pour aujourd'hui au format YYYY-MM-DD (recalculée chaque minute)"""
+    # Les changements de jour tombent toujours sur une minute pile
+    bucket = int(time.time()) // 60
+    if bucket != _TODAY_CACHE[0]:
+        _TODAY_CACHE[0] = bucket
+        _TODAY_CACHE[1] = datetime.now(TIMEZONE).strftime("%Y-%m-%d")
+    return _TODAY_CACHE[1]
+
+def now_hm() -> str:
+    """Retourne l'heure actuelle au format HH:MM (recalculée chaque minute)"""
+    bucket = int(time.time()) // 60
+    if bucket != _HM_CACHE[0]:
+        _HM_CACHE[0] = bucket
+        _HM_CACHE[1] = datetime.now(TIMEZONE).strftime("%H:%M")
+    return _HM_CACHE[1]
+
+def get_cutoff_key() -> str:
+    """Retourne la plus ancienne date conservée (YYYY-MM-DD), les précédentes sont supprimées"""
+    return (datetime.now(TIMEZONE) - timedelta(days=3)).strftime("%Y-%m-%d")
 
 def init_day(date_key: str):
     """Initialise une nouvelle journée"""
     if date_key not in daily_data:
         daily_data[date_key] = {
-            "entries": [],
-            "totals": {"kcal": 0, "proteines": 0, "lipides": 0, "glucides": 0}
+            "entries": deque(maxlen=MAX_ENTRIES_PER_DAY),
+            "totals": {"kcal": 0, "proteines": 0, "lipides": 0, "glucides": 0},
+            "_prot_pct": 0,
+            "_status_emoji": "🔴"
         }
+        # Les jours sont créés dans l'ordre: le premier est le plus ancien
+        while len(daily_data) > MAX_DAYS:
+            daily_data.popitem(last=False)
 
 def get_remaining() -> dict:
     """Calcule ce qu'il reste à consommer aujourd'hui"""
@@ -55,45 +128,50 @@ def get_remaining() -> dict:
     init_day(today)
     
     totals = daily_data[today]["totals"]
-    return {
-        "kcal": DAILY_GOALS["kcal"] - totals["kcal"],
-        "proteines": DAILY_GOALS["proteines"] - totals["proteines"],
-        "lipides": DAILY_GOALS["lipides"] - totals["lipides"],
-        "glucides": DAILY_GOALS["glucides"] - totals["glucides"]
-    }
+    return {key: goal - totals[key] for key, goal in DAILY_GOALS.items()}
+
+def update_totals(date_key: str, macros: dict, sign: int = 1):
+    """Ajoute (sign=1) ou retire (sign=-1) des macros aux totaux du jour"""
+    totals = daily_data[date_key]["totals"]
+    totals["kcal"] += sign * macros["kcal"]
+    totals["proteines"] += sign * macros["proteines"]
+    totals["lipides"] += sign * macros["lipides"]
+    totals["glucides"] += sign * macros["glucides"]
+
+    # Résumé protéines pour /history, recalculé à chaque modification
+    prot_pct = (totals["proteines"] / DAILY_GOALS["proteines"]) * 100
+    if prot_pct >= 90:
+        status_emoji = "🟢"
+    elif prot_pct >= 70:
+        status_emoji = "🟡"
+    else:
+        status_emoji = "🔴"
+    daily_data[date_key]["_prot_pct"] = prot_pct
+    daily_data[date_key]["_status_emoji"] = status_emoji
 
-def create_progress_bar(current: float, goal: float, length: int = 8) -> str:
-    """Crée une barre de progression compacte"""
+def create_progress_bar(current: float, goal: float) -> str:
+    """Crée une barre de progression compacte (BAR_LENGTH points)"""
     pct = min(100, (current / goal) * 100) if goal > 0 else 0
-    filled = int(pct / (100 / length))
-    empty = length - filled
-    bar = "●" * filled + "○" * empty
-    return f"{bar} {pct:.0f}%"
+    return f"{BARS[max(0, int(pct * BAR_LENGTH / 100))]} {pct:.0f}%"
 
 def format_status(totals: dict, remaining: dict, show_entries: bool = False) -> str:
     """Formate le message de statut"""
-    msg = "📊 **Statut du jour**\n\n"
-
-    # Tableau compact des macros
-    macros_data = [
-        ("🔥", "Kcal", totals['kcal'], DAILY_GOALS['kcal'], "", remaining['kcal']),
-        ("🥩", "Prot", totals['proteines'], DAILY_GOALS['proteines'], "g", remaining['proteines']),
-        ("🧈", "Lip", totals['lipides'], DAILY_GOALS['lipides'], "g", remaining['lipides']),
-        ("🍚", "Gluc", totals['glucides'], DAILY_GOALS['glucides'], "g", remaining['glucides']),
-    ]
-
-    for emoji, name, current, goal, unit, rest in macros_data:
-        bar = create_progress_bar(current, goal)
+    rows = []
+    for emoji, name, key, unit in STATUS_ROWS:
+        current = totals[key]
+        goal = DAILY_GOALS[key]
+        rest = remaining[key]
+        pct = min(100, (current / goal) * 100) if goal > 0 else 0
+        bar = BARS[max(0, int(pct * BAR_LENGTH / 100))]
         if rest > 0:
             rest_txt = f"-{rest:.0f}{unit}"
         elif rest < 0:
             rest_txt = f"+{abs(rest):.0f}{unit}⚠️"
         else:
             rest_txt = "✓"
-        msg += f"{emoji} {name}: {current:.0f}/{goal}{unit}\n"
-        msg += f"    {bar} ({rest_txt})\n\n"
+        rows.append(f"{emoji} {name}: {current:.0f}/{goal}{unit}\n    {bar} {pct:.0f}% ({rest_txt})\n\n")
 
-    return msg
+    return f"📊 <b>Statut du jour</b>\n\n{''.join(rows)}"
 
 def parse_food_entry(text: str) -> list:
     """
@@ -111,7 +189,7 @@ def parse_food_entry(text: str) -> list:
     text = text.lower().strip()
     
     # Séparer par virgules ou "et" pour plusieurs aliments
-    items = re.split(r'[,\n]+|\bet\b', text)
+    items = text.replace('\n', ',').replace(' et ', ',').split(',')
     
     for item in items:
         item = item.strip()
@@ -120,13 +198,11 @@ def parse_food_entry(text: str) -> list:
         
         # Pattern: nombre + unité optionnelle + aliment
         # Ex: "200g pates", "3 oeufs", "1 verre lait"
-        pattern = r'^(\d+(?:[.,]\d+)?)\s*(g|gr|grammes?|ml|cl|l|kg)?\s*(?:de\s+|d\')?(.+)$'
-        match = re.match(pattern, item)
+        match = PAT_FOOD.match(item)
         
         if not match:
             # Pattern inversé: aliment + nombre + unité
-            pattern_inv = r'^(.+?)\s+(\d+(?:[.,]\d+)?)\s*(g|gr|grammes?|ml|cl|l|kg)?$'
-            match = re.match(pattern_inv, item)
+            match = PAT_FOOD_INV.match(item)
             if match:
                 food_name = match.group(1).strip()
                 quantity = float(match.group(2).replace(',', '.'))
@@ -144,38 +220,13 @@ def parse_food_entry(text: str) -> list:
         food_name = food_name.strip()
         
         # Convertir en grammes
-        if unit in ['kg']:
-            grams = quantity * 1000
-        elif unit in ['cl']:
-            grams = quantity * 10
-        elif unit in ['l']:
-            grams = quantity * 1000
-        elif unit in ['ml']:
-            grams = quantity
-        elif unit in ['g', 'gr', 'gramme', 'grammes', '']:
-            # Si pas d'unité, vérifier si c'est une unité standard
-            if unit == '' and quantity <= 20:  # Probablement une quantité d'unités
-                # Chercher dans les unités standards
-                unit_grams = None
-                for std_name, std_grams in STANDARD_UNITS.items():
-                    if std_name in food_name or food_name in std_name:
-                        unit_grams = std_grams
-                        break
-                
-                if unit_grams:
-                    grams = quantity * unit_grams
-                else:
-                    # Vérifier si l'aliment a une unité standard
-                    food_info = get_food_info(food_name)
-                    if food_info and food_name in STANDARD_UNITS:
-                        grams = quantity * STANDARD_UNITS[food_name]
-                    else:
-                        grams = quantity  # Assume grammes par défaut
-            else:
-                grams = quantity
+        if unit == '' and quantity <= 20:  # Probablement une quantité d'unités
+            # Chercher dans les unités standards
+            unit_grams = get_standard_unit(food_name)
+            grams = quantity * unit_grams if unit_grams else quantity  # Assume grammes par défaut
         else:
-            grams = quantity
-        
+            grams = quantity * UNIT_TO_GRAMS.get(unit, 1)
+
         # Chercher l'aliment dans la base
         food_info = get_food_info(food_name)
         
@@ -196,41 +247,200 @@ def parse_food_entry(text: str) -> list:
     
     return results
 
-# ==================== HANDLERS TELEGRAM ====================
+@functools.lru_cache(maxsize=2048)
+def _parse_cached(text: str) -> tuple:
+    """parse_food_entry() en cache, pour les repas saisis à l'identique (texte déjà normalisé)"""
+    return tuple(parse_food_entry(text))
+
+def _parse_number(token: str, suffix: str) -> float:
+    """Retourne le nombre devant le suffixe ("150kcal" -> 150.0) ou None"""
+    if not token.endswith(suffix):
+        return None
+    number = token[:-len(suffix)]
+    if not number.replace('.', '', 1).isdecimal():
+        return None
+    return float(number)
+
+def parse_quick_add(text: str) -> tuple:
+    """
+    Parse un ajout rapide du type "30g 150kcal 10p 5l 8g" ou "150kcal 10p 5l 8g"
+    Retourne (grammes, kcal, prot, lip, gluc) ou None si non reconnu
+    """
+    text = text.lower()
+    tokens = text.replace(',', '.').split()
+
+    # Cas courant: tokens collés ("150kcal"), découpés sans regex
+    grams = 100  # Assume 100g par défaut
+    if len(tokens) == 5:
+        quantity = tokens.pop(0)
+        for unit in ("grammes", "gramme", "gr", "g"):
+            grams = _parse_number(quantity, unit)
+            if grams is not None:
+                break
+    if grams is not None and len(tokens) == 4:
+        values = tuple(_parse_number(token, suffix) for token, suffix in zip(tokens, ("kcal", "p", "l", "g")))
+        if None not in values:
+            return (grams,) + values
+
+    # Sinon, formats plus souples ("150 kcal 10 p ...")
+    match = PAT_ADD_FULL.match(text)
+    if match:
+        return (
+            float(match.group(1).replace(',', '.')),
+            float(match.group(3).replace(',', '.')),
+            float(match.group(4).replace(',', '.')),
+            float(match.group(5).replace(',', '.')),
+            float(match.group(6).replace(',', '.'))
+        )
+
+    match = PAT_ADD_NOQTY.match(text)
+    if match:
+        return (
+            100,
+            float(match.group(1).replace(',', '.')),
+            float(match.group(2).replace(',', '.')),
+            float(match.group(3).replace(',', '.')),
+            float(match.group(4).replace(',', '.'))
+        )
+
+    return None
+
+# ==================== PERSISTANCE ====================
+
+# Une seule connexion, utilisée depuis un unique thread pour sérialiser les écritures
+db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+db_conn = None
+
+def init_db():
+    """Ouvre la base SQLite et crée la table des entrées si besoin"""
+    global db_conn
+    db_conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    db_conn.execute("""
+        CREATE TABLE IF NOT EXISTS entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            food TEXT NOT NULL,
+            grams REAL NOT NULL,
+            kcal REAL NOT NULL,
+            prot REAL NOT NULL,
+            lip REAL NOT NULL,
+            gluc REAL NOT NULL
+        )
+    """)
+    db_conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_date ON entries (date)")
+    db_conn.commit()
+
+def save_entry(date_key: str, entry: dict):
+    """Enregistre une entrée dans la base"""
+    macros = entry["macros"]
+    with db_conn:
+        db_conn.execute(
+            "INSERT INTO entries (date, time, food, grams, kcal, prot, lip, gluc) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (date_key, entry["time"], entry["food"], entry["quantity"],
+             macros["kcal"], macros["proteines"], macros["lipides"], macros["glucides"])
+        )
+
+def delete_last_entry(date_key: str):
+    """Supprime la dernière entrée du jour (pour /undo)"""
+    with db_conn:
+        db_conn.execute(
+            "DELETE FROM entries WHERE id = (SELECT MAX(id) FROM entries WHERE date = ?)",
+            (date_key,)
+        )
+
+def prune_entries(cutoff_key: str):
+    """Supprime les entrées antérieures à cutoff_key"""
+    with db_conn:
+        db_conn.execute("DELETE FROM entries WHERE date < ?", (cutoff_key,))
+
+def load_daily_data():
+    """Reconstruit daily_data à partir des entrées récentes de la base"""
+    rows = db_conn.execute(
+        "SELECT date, time, food, grams, kcal, prot, lip, gluc FROM entries WHERE date >= ? ORDER BY id",
+        (get_cutoff_key(),)
+    ).fetchall()
+
+    for date_key, entry_time, food, grams, kcal, prot, lip, gluc in rows:
+        init_day(date_key)
+        macros = {"kcal": kcal, "proteines": prot, "lipides": lip, "glucides": gluc}
+        daily_data[date_key]["entries"].append({
+            "food": food,
+            "quantity": grams,
+            "macros": macros,
+            "time": entry_time
+        })
+        update_totals(date_key, macros)
+
+    logger.info(f"{len(rows)} entrées rechargées depuis {DB_PATH}")
+
+async def run_db(func, *args):
+    """Exécute une opération SQLite hors de la boucle asyncio"""
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(db_executor, func, *args)
+    except sqlite3.Error as e:
+        logger.error(f"Erreur SQLite ({func.__name__}): {e}")
 
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handler pour /start"""
-    msg = """🏋️ **Nutrition Bot** - Prise de Masse
+# ==================== MESSAGES ====================
 
-📊 **Objectifs journaliers:**
+# Messages statiques, envoyés en texte brut (parse_mode=None)
+START_MSG = """🏋️ Nutrition Bot - Prise de Masse
+
+📊 Objectifs journaliers:
 🔥 3100 kcal | 🥩 160g prot | 🧈 90g lip | 🍚 400g gluc
 
-💬 **Comment m'utiliser:**
-Envoie ce que tu manges: `200g pâtes` ou `3 oeufs`
+💬 Comment m'utiliser:
+Envoie ce que tu manges: 200g pâtes ou 3 oeufs
 
-📋 **Commandes:**
+📋 Commandes:
 /status /history /add /undo /search /help
 
 Let's go! 💪"""
 
-    await update.message.reply_text(msg, parse_mode='Markdown')
+HELP_MSG = """📖 Aide
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handler pour /help"""
-    msg = """📖 **Aide**
-
-**Formats:** `200g poulet`, `3 oeufs`, `1 verre lait`
+Formats: 200g poulet, 3 oeufs, 1 verre lait
 
-**Unités:** œuf=60g, verre=200ml, yaourt=125g, banane=120g
+Unités: œuf=60g, verre=200ml, yaourt=125g, banane=120g
 
-**Ajout rapide:** `/add 150kcal 10p 5l 8g`
-**Sauvegarder:** `/add nom|kcal|prot|lip|gluc`
+Ajout rapide: /add 150kcal 10p 5l 8g
+Sauvegarder: /add nom|kcal|prot|lip|gluc
 
-**Rappels:** 12h, 18h, 23h
+Rappels: 12h, 18h, 23h
 
 /status /history /undo /search /list"""
 
-    await update.message.reply_text(msg, parse_mode='Markdown')
+ADD_USAGE_MSG = """📝 Ajouter
+
+Ajout rapide: /add 150kcal 10p 5l 8g
+Sauvegarder: /add nom|kcal|prot|lip|gluc"""
+
+LIST_MSG = """📋 Catégories disponibles:
+
+• Viandes (poulet, boeuf, porc, dinde...)
+• Poissons (saumon, thon, cabillaud...)
+• Œufs & produits laitiers
+• Féculents (pâtes, riz, pain...)
+• Légumes (~35 variétés)
+• Fruits (~25 variétés)
+• Oléagineux & graines
+• Huiles & matières grasses
+• Compléments (whey, barres...)
+
+Total: ~170 aliments
+
+Utilise /search [terme] pour chercher un aliment spécifique."""
+
+# ==================== HANDLERS TELEGRAM ====================
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler pour /start"""
+    await update.message.reply_text(START_MSG, parse_mode=None)
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler pour /help"""
+    await update.message.reply_text(HELP_MSG, parse_mode=None)
 
 async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler pour /status"""
@@ -241,11 +451,11 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     remaining = get_remaining()
     
     msg = format_status(totals, remaining)
-    await update.message.reply_text(msg, parse_mode='Markdown')
+    await update.message.reply_text(msg)
 
 async def history(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler pour /history - affiche les 3 derniers jours"""
-    msg = "📅 **Historique**\n\n"
+    msg = "📅 <b>Historique</b>\n\n"
 
     today = datetime.now(TIMEZONE)
 
@@ -261,23 +471,15 @@ async def history(update: Update, context: ContextTypes.DEFAULT_TYPE):
         else:
             label = date.strftime("%a")
 
-        if date_key in daily_data and daily_data[date_key]["entries"]:
-            totals = daily_data[date_key]["totals"]
-            prot_pct = (totals["proteines"] / DAILY_GOALS["proteines"]) * 100
-
-            if prot_pct >= 90:
-                status = "🟢"
-            elif prot_pct >= 70:
-                status = "🟡"
-            else:
-                status = "🔴"
-
-            msg += f"{status} **{label}** {date_display}\n"
+        day = daily_data.get(date_key)
+        if day and day["entries"]:
+            totals = day["totals"]
+            msg += f"{day['_status_emoji']} <b>{label}</b> {date_display}\n"
             msg += f"   {totals['kcal']:.0f}kcal | {totals['proteines']:.0f}p | {totals['lipides']:.0f}l | {totals['glucides']:.0f}g\n\n"
         else:
-            msg += f"⚪ **{label}** {date_display} - Aucune donnée\n\n"
+            msg += f"⚪ <b>{label}</b> {date_display} - Aucune donnée\n\n"
 
-    await update.message.reply_text(msg, parse_mode='Markdown')
+    await update.message.reply_text(msg)
 
 async def undo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler pour /undo - annule la dernière entrée"""
@@ -287,26 +489,24 @@ async def undo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     init_day(today)
     
     if not daily_data[today]["entries"]:
-        await update.message.reply_text("❌ Aucune entrée à annuler aujourd'hui.")
+        await update.message.reply_text("❌ Aucune entrée à annuler aujourd'hui.", parse_mode=None)
         return
     
     # Retirer la dernière entrée
     last = daily_data[today]["entries"].pop()
     
     # Mettre à jour les totaux
-    daily_data[today]["totals"]["kcal"] -= last["macros"]["kcal"]
-    daily_data[today]["totals"]["proteines"] -= last["macros"]["proteines"]
-    daily_data[today]["totals"]["lipides"] -= last["macros"]["lipides"]
-    daily_data[today]["totals"]["glucides"] -= last["macros"]["glucides"]
+    update_totals(today, last["macros"], sign=-1)
+    await run_db(delete_last_entry, today)
     
-    msg = f"↩️ **Entrée annulée:**\n"
-    msg += f"   {last['quantity']:.0f}g {last['food']}\n"
+    msg = f"↩️ <b>Entrée annulée:</b>\n"
+    msg += f"   {last['quantity']:.0f}g {html.escape(last['food'])}\n"
     msg += f"   ({last['macros']['kcal']:.0f} kcal, {last['macros']['proteines']:.1f}g prot)\n\n"
     
     remaining = get_remaining()
-    msg += f"⏳ **Reste:** {remaining['kcal']:.0f} kcal | {remaining['proteines']:.0f}g prot"
+    msg += f"⏳ <b>Reste:</b> {remaining['kcal']:.0f} kcal | {remaining['proteines']:.0f}g prot"
     
-    await update.message.reply_text(msg, parse_mode='Markdown')
+    await update.message.reply_text(msg)
 
 async def add_food(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler pour /add - deux modes disponibles:
@@ -316,11 +516,7 @@ async def add_food(update: Update, context: ContextTypes.DEFAULT_TYPE):
     global last_entry
 
     if not context.args or len(context.args) < 1:
-        msg = """📝 **Ajouter**
-
-**Ajout rapide:** `/add 150kcal 10p 5l 8g`
-**Sauvegarder:** `/add nom|kcal|prot|lip|gluc`"""
-        await update.message.reply_text(msg, parse_mode='Markdown')
+        await update.message.reply_text(ADD_USAGE_MSG, parse_mode=None)
         return
 
     full_args = ' '.join(context.args)
@@ -330,7 +526,7 @@ async def add_food(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parts = full_args.split('|')
 
         if len(parts) != 5:
-            await update.message.reply_text("❌ Format: `/add nom|kcal|prot|lip|gluc`", parse_mode='Markdown')
+            await update.message.reply_text("❌ Format: /add nom|kcal|prot|lip|gluc", parse_mode=None)
             return
 
         try:
@@ -341,45 +537,33 @@ async def add_food(update: Update, context: ContextTypes.DEFAULT_TYPE):
             gluc = float(parts[4])
 
             FOODS_DATABASE[name] = (kcal, prot, lip, gluc)
+            index_food(name)
+            # Les recherches en cache peuvent dépendre du nouvel aliment
+            get_food_info.cache_clear()
+            _parse_cached.cache_clear()
 
-            msg = f"✅ **{name}** ajouté (100g)\n"
+            name_html = html.escape(name)
+            msg = f"✅ <b>{name_html}</b> ajouté (100g)\n"
             msg += f"🔥{kcal} | 🥩{prot}g | 🧈{lip}g | 🍚{gluc}g\n\n"
-            msg += f"→ Utilise: `{name} 100g`"
+            msg += f"→ Utilise: <code>{name_html} 100g</code>"
 
-            await update.message.reply_text(msg, parse_mode='Markdown')
+            await update.message.reply_text(msg)
 
         except ValueError:
-            await update.message.reply_text("❌ Les valeurs doivent être des nombres.", parse_mode='Markdown')
+            await update.message.reply_text("❌ Les valeurs doivent être des nombres.", parse_mode=None)
         return
 
     # Mode 1: Ajout rapide (format: /add 30g 150kcal 10p 5l 8g)
-    # Pattern pour parser: quantité + macros
-    pattern = r'(\d+(?:[.,]\d+)?)\s*(g|gr|grammes?)\s+(\d+(?:[.,]\d+)?)\s*kcal\s+(\d+(?:[.,]\d+)?)\s*p\s+(\d+(?:[.,]\d+)?)\s*l\s+(\d+(?:[.,]\d+)?)\s*g'
-    match = re.match(pattern, full_args.lower())
-
-    if not match:
-        # Essayer format alternatif: /add 150kcal 10p 5l 8g (sans quantité, assume 1 portion)
-        pattern_no_qty = r'(\d+(?:[.,]\d+)?)\s*kcal\s+(\d+(?:[.,]\d+)?)\s*p\s+(\d+(?:[.,]\d+)?)\s*l\s+(\d+(?:[.,]\d+)?)\s*g'
-        match_no_qty = re.match(pattern_no_qty, full_args.lower())
-
-        if match_no_qty:
-            grams = 100  # Assume 100g par défaut
-            kcal = float(match_no_qty.group(1).replace(',', '.'))
-            prot = float(match_no_qty.group(2).replace(',', '.'))
-            lip = float(match_no_qty.group(3).replace(',', '.'))
-            gluc = float(match_no_qty.group(4).replace(',', '.'))
-        else:
-            msg = "❌ Format non reconnu.\n\n"
-            msg += "**Ajout rapide:** `/add 30g 150kcal 10p 5l 8g`\n"
-            msg += "**Sauvegarder:** `/add nom|kcal|prot|lip|gluc`"
-            await update.message.reply_text(msg, parse_mode='Markdown')
-            return
-    else:
-        grams = float(match.group(1).replace(',', '.'))
-        kcal = float(match.group(3).replace(',', '.'))
-        prot = float(match.group(4).replace(',', '.'))
-        lip = float(match.group(5).replace(',', '.'))
-        gluc = float(match.group(6).replace(',', '.'))
+    parsed = parse_quick_add(full_args)
+
+    if not parsed:
+        msg = "❌ Format non reconnu.\n\n"
+        msg += "Ajout rapide: /add 30g 150kcal 10p 5l 8g\n"
+        msg += "Sauvegarder: /add nom|kcal|prot|lip|gluc"
+        await update.message.reply_text(msg, parse_mode=None)
+        return
+
+    grams, kcal, prot, lip, gluc = parsed
 
     # Ajouter directement au journal du jour
     today = get_today_key()
@@ -396,74 +580,56 @@ async def add_food(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "food": f"ajout manuel ({grams:.0f}g)",
         "quantity": grams,
         "macros": macros,
-        "time": datetime.now(TIMEZONE).strftime("%H:%M")
+        "time": now_hm()
     }
 
     daily_data[today]["entries"].append(entry)
     last_entry = entry
 
     # Mettre à jour les totaux
-    for key in ["kcal", "proteines", "lipides", "glucides"]:
-        daily_data[today]["totals"][key] += macros[key]
+    update_totals(today, macros)
+    await run_db(save_entry, today, entry)
 
     remaining = get_remaining()
     totals = daily_data[today]["totals"]
 
-    msg = f"✅ **Ajout rapide** ({grams:.0f}g)\n"
+    msg = f"✅ <b>Ajout rapide</b> ({grams:.0f}g)\n"
     msg += f"🔥{kcal:.0f} | 🥩{prot:.0f}g | 🧈{lip:.0f}g | 🍚{gluc:.0f}g\n\n"
 
-    msg += "**Progression:**\n"
-    for key, emoji in [("kcal", "🔥"), ("proteines", "🥩"), ("lipides", "🧈"), ("glucides", "🍚")]:
-        pct = min(100, (totals[key] / DAILY_GOALS[key]) * 100)
+    msg += "<b>Progression:</b>\n"
+    for emoji, _, key, unit in STATUS_ROWS:
         bar = create_progress_bar(totals[key], DAILY_GOALS[key])
         rest = remaining[key]
-        unit = "" if key == "kcal" else "g"
         rest_txt = f"-{rest:.0f}{unit}" if rest > 0 else "✓"
         msg += f"{emoji} {bar} ({rest_txt})\n"
 
-    await update.message.reply_text(msg, parse_mode='Markdown')
+    await update.message.reply_text(msg)
 
 async def search_food(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler pour /search - chercher un aliment"""
     if not context.args:
-        await update.message.reply_text("Usage: `/search poulet`", parse_mode='Markdown')
+        await update.message.reply_text("Usage: /search poulet", parse_mode=None)
         return
     
     query = ' '.join(context.args)
     results = search_foods(query)
     
     if not results:
-        await update.message.reply_text(f"❌ Aucun aliment trouvé pour '{query}'")
+        await update.message.reply_text(f"❌ Aucun aliment trouvé pour '{query}'", parse_mode=None)
         return
     
-    msg = f"🔍 **Résultats pour '{query}':**\n\n"
+    msg = f"🔍 <b>Résultats pour '{html.escape(query)}':</b>\n\n"
     
     for food in results[:8]:
         info = FOODS_DATABASE[food]
-        msg += f"• **{food}** (100g)\n"
+        msg += f"• <b>{html.escape(food)}</b> (100g)\n"
         msg += f"   {info[0]} kcal | {info[1]}g P | {info[2]}g L | {info[3]}g G\n"
     
-    await update.message.reply_text(msg, parse_mode='Markdown')
+    await update.message.reply_text(msg)
 
 async def list_foods(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler pour /list - liste les catégories d'aliments"""
-    msg = """📋 **Catégories disponibles:**
-
-• Viandes (poulet, boeuf, porc, dinde...)
-• Poissons (saumon, thon, cabillaud...)
-• Œufs & produits laitiers
-• Féculents (pâtes, riz, pain...)
-• Légumes (~35 variétés)
-• Fruits (~25 variétés)
-• Oléagineux & graines
-• Huiles & matières grasses
-• Compléments (whey, barres...)
-
-**Total: ~170 aliments**
-
-Utilise `/search [terme]` pour chercher un aliment spécifique."""
-
-    await update.message.reply_text(msg, parse_mode='Markdown')
+    await update.message.reply_text(LIST_MSG, parse_mode=None)
 
 async def handle_food_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler pour les messages texte (entrées alimentaires)"""
@@ -479,13 +645,13 @@ async def handle_food_message(update: Update, context: ContextTypes.DEFAULT_TYPE
     init_day(today)
 
     # Parser l'entrée
-    entries = parse_food_entry(text)
+    entries = _parse_cached(text.lower().strip())
 
     if not entries:
-        await update.message.reply_text("❓ Je n'ai pas compris. Essaie: `200g poulet` ou `3 oeufs`", parse_mode='Markdown')
+        await update.message.reply_text("❓ Je n'ai pas compris. Essaie: 200g poulet ou 3 oeufs", parse_mode=None)
         return
 
-    msg = "✅ **Enregistré**\n\n"
+    msg = "✅ <b>Enregistré</b>\n\n"
     not_found = []
 
     for food_name, grams, macros in entries:
@@ -493,42 +659,41 @@ async def handle_food_message(update: Update, context: ContextTypes.DEFAULT_TYPE
             entry = {
                 "food": food_name,
                 "quantity": grams,
-                "macros": macros,
-                "time": datetime.now(TIMEZONE).strftime("%H:%M")
+                "macros": dict(macros),  # Copie: macros est partagé par le cache
+                "time": now_hm()
             }
             daily_data[today]["entries"].append(entry)
             last_entry = entry
 
-            for key in ["kcal", "proteines", "lipides", "glucides"]:
-                daily_data[today]["totals"][key] += macros[key]
+            update_totals(today, macros)
+            await run_db(save_entry, today, entry)
 
-            msg += f"• {grams:.0f}g {food_name}\n"
+            msg += f"• {grams:.0f}g {html.escape(food_name)}\n"
             msg += f"  🔥{macros['kcal']:.0f} | 🥩{macros['proteines']:.0f}g | 🧈{macros['lipides']:.0f}g | 🍚{macros['glucides']:.0f}g\n\n"
         else:
             not_found.append(food_name)
 
     if not_found:
-        msg += f"⚠️ Non trouvé: {', '.join(not_found)}\n"
-        msg += "→ `/add 150kcal 10p 5l 8g`\n\n"
+        msg += f"⚠️ Non trouvé: {html.escape(', '.join(not_found))}\n"
+        msg += "→ <code>/add 150kcal 10p 5l 8g</code>\n\n"
 
     remaining = get_remaining()
     totals = daily_data[today]["totals"]
 
-    msg += "**Progression:**\n"
-    for key, emoji in [("kcal", "🔥"), ("proteines", "🥩"), ("lipides", "🧈"), ("glucides", "🍚")]:
+    msg += "<b>Progression:</b>\n"
+    for emoji, _, key, unit in STATUS_ROWS:
         bar = create_progress_bar(totals[key], DAILY_GOALS[key])
         rest = remaining[key]
-        unit = "" if key == "kcal" else "g"
         rest_txt = f"-{rest:.0f}{unit}" if rest > 0 else "✓"
         msg += f"{emoji} {bar} ({rest_txt})\n"
 
-    await update.message.reply_text(msg, parse_mode='Markdown')
+    await update.message.reply_text(msg)
 
 # ==================== RAPPELS PROGRAMMÉS ====================
 
 async def send_reminder(context: ContextTypes.DEFAULT_TYPE, reminder_type: str):
     """Envoie un rappel programmé"""
-    if not CHAT_ID:
+    if not REMINDER_CHAT_IDS:
         logger.warning("CHAT_ID non configuré, rappel ignoré")
         return
     
@@ -539,51 +704,53 @@ async def send_reminder(context: ContextTypes.DEFAULT_TYPE, reminder_type: str):
     remaining = get_remaining()
     
     if reminder_type == "midi":
-        msg = "🕛 **POINT MIDI**\n\n"
+        msg = "🕛 <b>POINT MIDI</b>\n\n"
     elif reminder_type == "soir":
-        msg = "🕕 **POINT 18H**\n\n"
+        msg = "🕕 <b>POINT 18H</b>\n\n"
     else:  # recap
-        msg = "🌙 **RÉCAP DE LA JOURNÉE**\n\n"
+        msg = "🌙 <b>RÉCAP DE LA JOURNÉE</b>\n\n"
     
     msg += format_status(totals, remaining)
     
     if reminder_type == "recap":
         # Ajouter les détails des entrées
         if daily_data[today]["entries"]:
-            msg += "\n\n📝 **Entrées du jour:**\n"
+            msg += "\n\n📝 <b>Entrées du jour:</b>\n"
             for entry in daily_data[today]["entries"]:
-                msg += f"   • {entry['time']} - {entry['quantity']:.0f}g {entry['food']}\n"
+                msg += f"   • {entry['time']} - {entry['quantity']:.0f}g {html.escape(entry['food'])}\n"
         
         # Évaluation finale
-        prot_pct = (totals['proteines'] / DAILY_GOALS['proteines']) * 100
+        prot_pct = daily_data[today]["_prot_pct"]
         if prot_pct >= 100:
-            msg += "\n\n🏆 **Objectif protéines atteint !** Bien joué 💪"
+            msg += "\n\n🏆 <b>Objectif protéines atteint !</b> Bien joué 💪"
         elif prot_pct >= 90:
-            msg += "\n\n👍 **Presque !** Tu y es presque, continue comme ça !"
+            msg += "\n\n👍 <b>Presque !</b> Tu y es presque, continue comme ça !"
         else:
-            msg += f"\n\n⚠️ **Attention:** Seulement {prot_pct:.0f}% des protéines. Pense à ajuster demain !"
-    
-    try:
-        await context.bot.send_message(chat_id=CHAT_ID, text=msg, parse_mode='Markdown')
-    except Exception as e:
-        logger.error(f"Erreur envoi rappel: {e}")
+            msg += f"\n\n⚠️ <b>Attention:</b> Seulement {prot_pct:.0f}% des protéines. Pense à ajuster demain !"
+    
+    # Envoi par vagues: les envois d'une vague partent en parallèle, une vague par seconde
+    for start_idx in range(0, len(REMINDER_CHAT_IDS), REMINDER_WAVE_SIZE):
+        if start_idx:
+            await asyncio.sleep(1.05)
+        wave = REMINDER_CHAT_IDS[start_idx:start_idx + REMINDER_WAVE_SIZE]
+        results = await asyncio.gather(
+            *(context.bot.send_message(chat_id=chat_id, text=msg) for chat_id in wave),
+            return_exceptions=True
+        )
+        for chat_id, result in zip(wave, results):
+            if isinstance(result, Exception):
+                logger.error(f"Erreur envoi rappel ({chat_id}): {result}")
 
 async def midnight_reset(context: ContextTypes.DEFAULT_TYPE):
     """Reset à minuit - nettoie les anciennes données (garde 3 jours)"""
-    today = datetime.now(TIMEZONE)
-    cutoff = today - timedelta(days=4)
-    
-    keys_to_delete = []
-    for date_key in daily_data.keys():
-        try:
-            date = datetime.strptime(date_key, "%Y-%m-%d")
-            if date < cutoff.replace(tzinfo=None):
-                keys_to_delete.append(date_key)
-        except:
-            pass
-    
+    # Les clés YYYY-MM-DD se comparent correctement comme des chaînes
+    cutoff_key = get_cutoff_key()
+    keys_to_delete = [date_key for date_key in daily_data if date_key < cutoff_key]
+
     for key in keys_to_delete:
         del daily_data[key]
+
+    await run_db(prune_entries, cutoff_key)
     
     logger.info(f"Reset minuit effectué. Données supprimées: {keys_to_delete}")
 
@@ -638,8 +805,25 @@ def main():
         logger.error("TELEGRAM_TOKEN non défini!")
         return
     
+    # Recharger les entrées sauvegardées
+    init_db()
+    load_daily_data()
+
     # Créer l'application
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    # Limiteur d'envoi: reste sous la limite Telegram (~30 msg/s) et réessaie après un 429
+    rate_limiter = AIORateLimiter(overall_max_rate=25, max_retries=3)
+    application = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .defaults(Defaults(parse_mode=ParseMode.HTML))
+        .rate_limiter(rate_limiter)
+        # Pool HTTP partagé: les envois parallèles (vagues de rappels) ne s'attendent pas
+        .connection_pool_size(256)
+        .pool_timeout(1.0)
+        .connect_timeout(5.0)
+        .read_timeout(5.0)
+        .build()
+    )
     
     # Ajouter les handlers
     application.add_handler(CommandHandler("start", start))